@@ -1,9 +1,48 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect, select, func, and_
+from collections.abc import AsyncIterator
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncConnection
 from models import Base
 
+# Sync engine only backs init_db() for one-off scripts (see README:
+# `python -c "from db import init_db; init_db()"`); the app uses async_engine.
 engine = create_engine("sqlite:///tickets.db")
-SessionLocal = sessionmaker(bind=engine)
+
+# Async engine used by the request handlers (Core statements, no ORM session).
+async_engine = create_async_engine("sqlite+aiosqlite:///tickets.db")
+
+def _has_duplicates(conn, index) -> bool:
+    cols = list(index.columns)
+    dup = select(*cols).where(and_(*(c.isnot(None) for c in cols))).group_by(*cols).having(func.count() > 1).limit(1)
+    return conn.execute(dup).first() is not None
+
+def _create_schema(conn):
+    Base.metadata.create_all(bind=conn)
+    # create_all() skips tables that already exist, so add any missing indexes
+    # to databases created before the indexes were declared.
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            # an older tickets.db may hold duplicates that would make CREATE UNIQUE INDEX fail
+            if index.unique and _has_duplicates(conn, index):
+                cols = ", ".join(c.name for c in index.columns)
+                print(f"Not creating unique index {index.name}: {table.name} has duplicate {cols} values. "
+                      "Remove the duplicate rows and restart to add it.")
+                continue
+            index.create(bind=conn)
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _create_schema(conn)
+
+async def init_db_async():
+    """Async variant of init_db() used at application startup."""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(_create_schema)
+
+async def get_db() -> AsyncIterator[AsyncConnection]:
+    """FastAPI dependency yielding an async connection; callers commit explicitly."""
+    async with async_engine.connect() as conn:
+        yield conn
@@ -0,0 +1,78 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from db import async_engine
+from llm import classify_ticket
+from jira import create_jira_issue, get_project_meta, JIRA_PROJECT_KEY
+from slack import send_message_nowait, send_response, build_approval_block
+from models import TicketLog
+
+# Map LLM label to Jira issue type name in your project
+label_to_issue_type = {
+    "Task": "Task",
+    "Bug": "Bug",
+    "Incident": "Incident",
+    "Feature Request": "Task",
+    "Question": "Question",
+}
+
+# Prebuilt Core insert; SQLAlchemy caches its compiled form.
+_INSERT_TICKET_LOG = insert(TicketLog)
+
+
+async def _reply(channel_id, user_id, response_url, text, blocks=None):
+    # Slack's response_url takes a single unauthenticated POST; only fall back to
+    # a chat.postMessage Web API call when it is missing or the post fails.
+    if response_url and await send_response(response_url, text, blocks=blocks):
+        return
+    # queued, not awaited: the channel's drain task handles pacing and retries
+    send_message_nowait(channel_id, text, blocks=blocks, fallback_user=user_id)
+
+
+async def handle_ticket(text, user_id, channel_id, response_url):
+    """Classify a /ticket request, create the Jira issue and report back to Slack."""
+    # Run LLM classification (async). Fall back to "Task" on error or empty text.
+    try:
+        category = await classify_ticket(text) if text else "Task"
+    except Exception as e:
+        print("LLM classification failed:", e)
+        category = "Task"
+
+    issue_type_name = label_to_issue_type.get(category, "Task")
+
+    # Use configured project key from jira.py (JIRA_PROJECT_KEY), resolved to cached
+    # numeric ids when possible; build_jira_body also accepts the key/name as-is.
+    meta = await get_project_meta(JIRA_PROJECT_KEY)
+    project_id = (meta and meta["id"]) or JIRA_PROJECT_KEY
+    issue_type_id = (meta and meta["issue_types"].get(issue_type_name)) or issue_type_name
+    jira_key = await create_jira_issue(
+        summary=text,
+        description=text,
+        project_id=project_id,
+        issue_type_id=issue_type_id,
+    )
+    if jira_key:
+        # The Jira issue exists at this point, so a failed insert (e.g. a unique
+        # ticket_id clash) is logged and the user is still told about the ticket.
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(_INSERT_TICKET_LOG, {
+                    "slack_user": user_id,
+                    "slack_channel": channel_id,
+                    "ticket_id": jira_key,
+                    "jira_issue_key": jira_key,
+                    "llm_result": category,
+                    "status": "created",
+                })
+        except SQLAlchemyError as e:
+            print(f"Failed to record Jira ticket {jira_key} in the database:", e)
+        # Post the approval block to the channel
+        try:
+            await _reply(channel_id, user_id, response_url, f"Ticket has been created: {jira_key}", blocks=build_approval_block(jira_key))
+        except Exception as e:
+            print("Failed to send Slack message after creating Jira ticket:", e)
+    else:
+        print("Jira ticket creation failed. Check logs for details.")
+        try:
+            await _reply(channel_id, user_id, response_url, "Failed to create Jira ticket. Please check server logs.")
+        except Exception as e:
+            print("Failed to send failure message to Slack:", e)
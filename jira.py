@@ -1,120 +1,229 @@
+import asyncio
 import httpx
-import os
-from dotenv import load_dotenv
-import yaml
-import base64
-import json
-
-load_dotenv()
-with open(os.path.join(os.path.dirname(__file__), "config.yml"), "r") as f:
-    config = yaml.safe_load(f)
-
-# Read sensitive values from environment variables to avoid committing them to source control.
-JIRA_BASE_URL = config["JIRA_BASE_URL"]
-# Prefer the environment variable JIRA_EMAIL; fall back to config.yml for backward compatibility.
-JIRA_EMAIL = os.getenv("JIRA_EMAIL")
-JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
-JIRA_PROJECT_KEY = config.get("JIRA_PROJECT_KEY", "10000")  
-
-def get_jira_auth_header():
-    auth_str = f"{JIRA_EMAIL}:{JIRA_API_TOKEN}"
-    b64_auth = base64.b64encode(auth_str.encode()).decode()
-    return {"Authorization": f"Basic {b64_auth}"}
-
-
-def build_jira_payload(summary, description, project_id, issue_type_id, reporter_id=None):
-    adf_description = {
-        "type": "doc",
-        "version": 1,
-        "content": [
-            {
-                "type": "paragraph",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": str(description).strip() or "No description"
-                    }
-                ]
-            }
-        ]
-    }
-
+import logging
+import orjson
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+JIRA_BASE_URL = settings.JIRA_BASE_URL
+JIRA_EMAIL = settings.JIRA_EMAIL
+JIRA_API_TOKEN = settings.JIRA_API_TOKEN
+JIRA_PROJECT_KEY = settings.JIRA_PROJECT_KEY
+
+# Request headers are constant for the process lifetime, so build them once.
+_AUTH_HEADERS = {"Authorization": settings.JIRA_AUTH_HEADER}
+_POST_HEADERS = {**_AUTH_HEADERS, "Content-Type": "application/json"}
+_GET_HEADERS = {**_AUTH_HEADERS, "Accept": "application/json"}
+
+
+# A single pooled client is shared by all Jira calls so TCP/TLS connections to
+# Atlassian are reused instead of being re-established on every request.
+_jira_client: httpx.AsyncClient | None = None
+# Set by close_jira_client(); late calls during shutdown must not quietly open a
+# new pool that nothing would ever close.
+_jira_client_closed = False
+
+
+def get_jira_client() -> httpx.AsyncClient:
+    """Return the shared Jira client, creating it on first use."""
+    global _jira_client
+    if _jira_client_closed:
+        raise RuntimeError("Jira client is closed")
+    if _jira_client is None:
+        _jira_client = httpx.AsyncClient(
+            base_url=JIRA_BASE_URL,
+            headers=_AUTH_HEADERS,
+            http2=True,
+            timeout=15.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        )
+    return _jira_client
+
+
+async def close_jira_client():
+    global _jira_client, _jira_client_closed
+    _jira_client_closed = True
+    # cancel project lookups still in flight so none of them outlives the client
+    pending = list(_project_meta_inflight.values())
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if _jira_client is not None:
+        await _jira_client.aclose()
+        _jira_client = None
+
+
+def _json_bytes(value) -> bytes:
+    return orjson.dumps(value)
+
+
+# The ADF description and the surrounding issue body have a fixed shape, so the
+# request body is rendered from this template and only the variable values are
+# JSON-escaped per call (no nested dict building and no second serialization).
+_ISSUE_BODY_TEMPLATE = (
+    b'{"fields":{"project":%b,"issuetype":%b,"summary":%b,'
+    b'"description":{"type":"doc","version":1,"content":[{"type":"paragraph",'
+    b'"content":[{"type":"text","text":%b}]}]},"labels":[]%b}}'
+)
+
+
+def build_jira_body(summary, description, project_id, issue_type_id, reporter_id=None) -> bytes:
+    """Return the JSON request body for creating a Jira issue."""
     # project_id may be a numeric id or a project key; support both
-    project_field = {"id": project_id} if str(project_id).isdigit() else {"key": project_id}
+    project_field = b'{"%b":%b}' % (b"id" if str(project_id).isdigit() else b"key", _json_bytes(project_id))
 
     # issue_type_id may be numeric id or issue type name; support both
-    issuetype_field = {"id": issue_type_id} if str(issue_type_id).isdigit() else {"name": issue_type_id}
-
-    fields = {
-        "project": project_field,
-        "issuetype": issuetype_field,
-        "summary": summary,
-        "description": adf_description,
-        "labels": []
-    }
+    issuetype_field = b'{"%b":%b}' % (b"id" if str(issue_type_id).isdigit() else b"name", _json_bytes(issue_type_id))
 
     # Only include reporter if provided and doesn't look like a Slack user id (starts with 'U' or 'W')
+    reporter_field = b""
     if reporter_id and not str(reporter_id).startswith(("U", "W")):
-        fields["reporter"] = {"id": reporter_id}
-
-    return {"fields": fields}
+        reporter_field = b',"reporter":{"id":%b}' % _json_bytes(reporter_id)
+
+    return _ISSUE_BODY_TEMPLATE % (
+        project_field,
+        issuetype_field,
+        _json_bytes(summary),
+        _json_bytes(str(description).strip() or "No description"),
+        reporter_field,
+    )
+
+
+# Project and issue type ids practically never change, so the project metadata
+# (id plus its issue types by name) is fetched once per key and kept in memory.
+# A failed lookup is remembered for a short while so a Jira outage doesn't make
+# every /ticket wait on its own doomed request.
+PROJECT_META_FAILURE_TTL = 60.0
+_PROJECT_META_TIMEOUT = 5.0
+_project_meta: dict[str, dict] = {}
+_project_meta_failed: dict[str, float] = {}
+_project_meta_inflight: dict[str, asyncio.Task] = {}
+
+
+async def _fetch_project_meta(project_key: str) -> dict | None:
+    loop = asyncio.get_running_loop()
+    meta = None
+    try:
+        resp = await get_jira_client().get(
+            f"/rest/api/3/project/{project_key}", headers=_GET_HEADERS, timeout=_PROJECT_META_TIMEOUT
+        )
+        if resp.status_code != 200:
+            logger.error("Failed to fetch Jira project %s: status=%s", project_key, resp.status_code)
+        else:
+            body = orjson.loads(resp.content)
+            meta = {
+                "id": body.get("id"),
+                "issue_types": {it["name"]: it["id"] for it in body.get("issueTypes", [])},
+            }
+    except Exception as e:
+        logger.error("Failed to fetch Jira project %s: %s", project_key, e)
+    finally:
+        _project_meta_inflight.pop(project_key, None)
+    if meta is None:
+        _project_meta_failed[project_key] = loop.time() + PROJECT_META_FAILURE_TTL
+    else:
+        _project_meta[project_key] = meta
+        _project_meta_failed.pop(project_key, None)
+    return meta
+
+
+async def get_project_meta(project_key: str = JIRA_PROJECT_KEY) -> dict | None:
+    """Return {"id": ..., "issue_types": {name: id}} for a project (cached), or None.
+
+    Concurrent callers share a single in-flight request; after a failure None is
+    returned straight away until PROJECT_META_FAILURE_TTL has passed.
+    """
+    meta = _project_meta.get(project_key)
+    if meta is not None:
+        return meta
+    if _project_meta_failed.get(project_key, 0.0) > asyncio.get_running_loop().time():
+        return None
+    # shield: a caller being cancelled must not cancel the fetch others await.
+    return await asyncio.shield(_start_project_meta_fetch(project_key))
+
+
+def _start_project_meta_fetch(project_key: str) -> asyncio.Task:
+    task = _project_meta_inflight.get(project_key)
+    if task is None:
+        task = asyncio.create_task(_fetch_project_meta(project_key))
+        _project_meta_inflight[project_key] = task
+    return task
+
+
+def prefetch_project_meta(project_key: str = JIRA_PROJECT_KEY):
+    """Start loading the project metadata in the background unless it is already cached.
+
+    The fetch is tracked like any other lookup, so close_jira_client() cancels it.
+    """
+    if project_key not in _project_meta:
+        _start_project_meta_fetch(project_key)
 
 
 async def create_jira_issue(summary: str, description: str, project_id: str, issue_type_id: str, reporter_id: str = None) -> str:
-    url = f"{JIRA_BASE_URL}/rest/api/3/issue"
-    headers = {**get_jira_auth_header(), "Content-Type": "application/json"}
-    payload = build_jira_payload(summary, description, project_id, issue_type_id, reporter_id)
-
-    # Log the payload for debugging
-    print("Jira Payload:", json.dumps(payload, indent=2))
-    # Also log the raw body string we're sending
-    body_text = json.dumps(payload)
-    print("Jira Body Text (len={}):".format(len(body_text)))
-    print(body_text)
-
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(url, headers=headers, content=body_text)
-        try:
-            data = resp.json()
-        except Exception as e:
-            print("Failed to parse Jira response as JSON:", await resp.aread())
-            return None
-
-        if resp.status_code == 201 and "key" in data:
-            return data["key"]
-        else:
-            print(f"Jira issue creation failed: status={resp.status_code}")
-            print("Response:", json.dumps(data, indent=2))
-            return None
+    url = "/rest/api/3/issue"
+    body = build_jira_body(summary, description, project_id, issue_type_id, reporter_id)
+
+    # Log the payload for debugging (decoded only when debug logging is on)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Jira Payload: %s", body.decode())
+
+    client = get_jira_client()
+    resp = await client.post(url, headers=_POST_HEADERS, content=body)
+    try:
+        data = orjson.loads(resp.content)
+    except Exception as e:
+        logger.error("Failed to parse Jira response as JSON: %s", resp.text)
+        return None
+
+    if resp.status_code == 201 and "key" in data:
+        return data["key"]
+    else:
+        logger.error("Jira issue creation failed: status=%s response=%s", resp.status_code, data)
+        return None
 
 
 async def get_jira_status(issue_key: str) -> str:
     if not issue_key or not str(issue_key).strip():
-        print("get_jira_status: no issue_key provided")
+        logger.warning("get_jira_status: no issue_key provided")
         return "Unknown"
 
-    url = f"{JIRA_BASE_URL}/rest/api/3/issue/{issue_key}"
-    headers = {**get_jira_auth_header(), "Accept": "application/json"}
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"Fetching Jira status for {issue_key} -> {url}")
-            resp = await client.get(url, headers=headers)
-        except Exception as e:
-            print(f"Error while requesting Jira: {e}")
-            return "Unknown"
-
-        # Detailed logging for debugging
-        print(f"Jira status response: status={resp.status_code}")
-        try:
-            body = resp.json()
-            print("Jira response JSON:", json.dumps(body, indent=2))
-        except Exception:
-            text = await resp.aread()
-            print("Jira response text:", text)
-
-        if resp.status_code == 200:
-            fields = resp.json().get("fields", {})
-            return fields.get("status", {}).get("name", "Unknown")
-        else:
-            print(f"Failed to fetch Jira status: status={resp.status_code}")
-            return "Unknown"
+    url = f"/rest/api/3/issue/{issue_key}"
+    client = get_jira_client()
+    try:
+        logger.debug("Fetching Jira status for %s -> %s", issue_key, url)
+        resp = await client.get(url, headers=_GET_HEADERS)
+    except Exception as e:
+        logger.error("Error while requesting Jira: %s", e)
+        return "Unknown"
+
+    # Detailed logging for debugging
+    logger.debug("Jira status response: status=%s", resp.status_code)
+    try:
+        body = orjson.loads(resp.content)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Jira response JSON: %s", orjson.dumps(body, option=orjson.OPT_INDENT_2).decode())
+    except Exception:
+        logger.error("Jira response text: %s", resp.text)
+        body = None
+
+    if resp.status_code == 200 and isinstance(body, dict):
+        fields = body.get("fields", {})
+        return fields.get("status", {}).get("name", "Unknown")
+    else:
+        logger.error("Failed to fetch Jira status: status=%s", resp.status_code)
+        return "Unknown"
+
+
+async def get_jira_statuses(issue_keys: list[str], max_concurrency: int = 5) -> dict[str, str]:
+    """Fetch the status of several issues concurrently over the shared client."""
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def _one(key):
+        async with sem:
+            return await get_jira_status(key)
+
+    statuses = await asyncio.gather(*(_one(k) for k in issue_keys))
+    return dict(zip(issue_keys, statuses))
@@ -1,42 +1,105 @@
 import os
-import json
+import re
+import orjson
 import asyncio
-from dotenv import load_dotenv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 import httpx
 from pathlib import Path
+from settings import get_settings
 
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GGML_MODEL_PATH = os.getenv("GGML_MODEL_PATH")  # path to a ggml .bin model for llama.cpp / llama-cpp-python
+OPENAI_API_KEY = get_settings().OPENAI_API_KEY
+GGML_MODEL_PATH = get_settings().GGML_MODEL_PATH  # path to a ggml .bin model for llama.cpp / llama-cpp-python
+SEMANTIC_CACHE = get_settings().SEMANTIC_CACHE
 
 
 LABELS = ["Task", "Bug", "Incident", "Feature Request", "Question"]
 
+# Shared pooled client for OpenAI requests (created lazily on first use).
+_openai_client: httpx.AsyncClient | None = None
+
+
+def get_openai_client() -> httpx.AsyncClient:
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = httpx.AsyncClient(
+            base_url="https://api.openai.com/v1",
+            headers={"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"},
+            http2=True,
+            timeout=15.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        )
+    return _openai_client
+
+
+async def close_openai_client():
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.aclose()
+        _openai_client = None
+
+
+# Heuristic keyword lists, checked in priority order (first matching label wins).
+# Keywords match whole words; a trailing "*" marks a stem that also matches its
+# inflections (e.g. "crash*" matches crash, crashes, crashing).
+BUG_WORDS = [
+    "crash*", "exception*", "stack trace", "nullpointer", "segfault",
+    "error*", "fail*", "not working", "doesn't work", "doesnt work", "broken",
+    "login failed", "login error", "cannot login", "can't login", "cant login", "unable to login",
+    "authentication", "auth", "sign in", "signin", "login page"
+]
+INCIDENT_WORDS = ["outage*", "down", "downtime", "unavailable", "service is down", "cannot", "unable to", "timeout*", "incident*"]
+FEATURE_WORDS = ["feature*", "enhancement*", "request*", "add", "support", "improve*"]
+QUESTION_WORDS = ["how do", "how to", "why", "what is", "question*", "help", "can i"]
+
+
+# Plain single-word keywords are matched by set intersection against the
+# ticket's tokens; only multi-word phrases and stems need a (precompiled) regex scan.
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+
+def _keyword_rule(label: str, words: list[str]) -> tuple[str, frozenset, re.Pattern | None]:
+    singles = frozenset(w for w in words if " " not in w and not w.endswith("*"))
+    alternatives = [re.escape(w) for w in words if " " in w]
+    alternatives += [re.escape(w[:-1]) + r"\w*" for w in words if w.endswith("*")]
+    pattern_re = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b") if alternatives else None
+    return label, singles, pattern_re
+
+
+_HEURISTIC_RULES = [
+    _keyword_rule("Bug", BUG_WORDS),
+    _keyword_rule("Incident", INCIDENT_WORDS),
+    _keyword_rule("Feature Request", FEATURE_WORDS),
+    _keyword_rule("Question", QUESTION_WORDS),
+]
+
+
+# Minimum keyword hits for the heuristic to classify a ticket without an LLM call.
+HEURISTIC_MIN_SCORE = 2
+
 
 def _heuristic_label_from_text(text: str) -> str:
+    return _heuristic_label_with_score(text)[0]
+
+
+def _heuristic_label_with_score(text: str) -> tuple[str, int]:
+    """Return the heuristic label and its number of distinct keyword hits."""
     if not text:
-        return "Task"
+        return "Task", 0
     t = text.lower()
-    # bug-related keywords
-    bug_words = [
-        "crash", "crashes", "crashed", "exception", "stack trace", "nullpointer", "segfault",
-        "error", "fail", "failed", "not working", "doesn't work", "doesnt work", "broken",
-        "login failed", "login error", "cannot login", "can't login", "cant login", "unable to login",
-        "authentication", "auth", "sign in", "signin", "login page"
-    ]
-    incident_words = ["outage", "down", "unavailable", "service is down", "cannot", "unable to", "timeout", "incident"]
-    feature_words = ["feature", "enhancement", "request", "add", "support", "improve", "improvement"]
-    question_words = ["how do", "how to", "why", "what is", "question", "help", "can i"]
-
-    if any(w in t for w in bug_words):
-        return "Bug"
-    if any(w in t for w in incident_words):
-        return "Incident"
-    if any(w in t for w in feature_words):
-        return "Feature Request"
-    if any(w in t for w in question_words):
-        return "Question"
-    return "Task"
+    tokens = frozenset(_TOKEN_RE.findall(t))
+    for label, singles, pattern_re in _HEURISTIC_RULES:
+        matches = pattern_re.findall(t) if pattern_re else []
+        label_tokens = tokens
+        if matches:
+            # words inside a matched phrase count once, as part of that phrase
+            label_tokens = frozenset(_TOKEN_RE.findall(pattern_re.sub(" ", t)))
+        hits = len(set(matches)) + len(singles & label_tokens)
+        if hits:
+            return label, hits
+    return "Task", 0
 
 
 def _normalize_label(reply: str, original_text: str | None = None) -> str:
@@ -93,59 +156,171 @@ def _normalize_label(reply: str, original_text: str | None = None) -> str:
     return _heuristic_label_from_text(original_text)
 
 
-async def _classify_with_openai(text: str) -> str:
-    if not OPENAI_API_KEY:
-        print("OPENAI_API_KEY not set — skipping OpenAI classification.")
-        return "Task"
-
-    system_prompt = (
-        "You are a ticket classifier. Choose exactly one label from the list: "
-        "Task, Bug, Incident, Feature Request, Question. Respond with ONLY the label."
-    )
-    user_prompt = f"Classify the following ticket text:\n\n{text.strip()}"
-
+async def _openai_chat(system_prompt: str, user_prompt: str, max_tokens: int) -> str | None:
+    """Send one chat completion request and return the reply text, or None on failure."""
     payload = {
         "model": "gpt-3.5-turbo",
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ],
-        "max_tokens": 12,
+        "max_tokens": max_tokens,
         "temperature": 0.0,
         "n": 1
     }
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+        resp = await get_openai_client().post("/chat/completions", content=orjson.dumps(payload))
     except Exception as e:
         print("OpenAI request failed:", str(e))
-        return "Task"
+        return None
 
     if resp.status_code == 401:
         print("OpenAI API 401: check OPENAI_API_KEY and billing/permissions.")
-        return "Task"
+        return None
+
+    try:
+        data = orjson.loads(resp.content)
+    except Exception:
+        print("Failed to parse OpenAI response:", resp.text)
+        return None
 
     try:
-        data = resp.json()
+        return data["choices"][0]["message"]["content"].strip()
     except Exception:
-        print("Failed to parse OpenAI response:", await resp.aread())
+        print("Unexpected OpenAI response structure:", orjson.dumps(data)[:1000].decode(errors="replace"))
+        return None
+
+
+async def _classify_one_with_openai(text: str) -> str:
+    system_prompt = (
+        "You are a ticket classifier. Choose exactly one label from the list: "
+        "Task, Bug, Incident, Feature Request, Question. Respond with ONLY the label."
+    )
+    user_prompt = f"Classify the following ticket text:\n\n{text.strip()}"
+
+    reply = await _openai_chat(system_prompt, user_prompt, max_tokens=12)
+    if reply is None:
         return "Task"
+    return _normalize_label(reply, original_text=text)
+
+
+async def _classify_many_with_openai(texts: list[str]) -> list[str | None]:
+    """Classify several tickets with a single chat completion request.
+
+    Tickets the reply has no entry for come back as None.
+    """
+    system_prompt = (
+        "You are a ticket classifier. For each numbered ticket choose exactly one label from the list: "
+        "Task, Bug, Incident, Feature Request, Question. Respond with ONLY a JSON array with one "
+        'entry per ticket, e.g. [{"i": 0, "label": "Bug"}, {"i": 1, "label": "Task"}].'
+    )
+    user_prompt = "Classify the following tickets:\n\n" + "\n\n".join(
+        f"[{i}] {t.strip()}" for i, t in enumerate(texts)
+    )
+
+    reply = await _openai_chat(system_prompt, user_prompt, max_tokens=16 * len(texts))
+    if reply is None:
+        return ["Task"] * len(texts)
 
+    replies = {}
     try:
-        reply = data["choices"][0]["message"]["content"].strip()
+        # tolerate code fences or prose around the array
+        items = orjson.loads(reply[reply.index("["): reply.rindex("]") + 1])
+        for item in items:
+            if isinstance(item.get("label"), str) and item["label"].strip():
+                replies[int(item["i"])] = item["label"]
     except Exception:
-        print("Unexpected OpenAI response structure:", json.dumps(data)[:1000])
+        print("Unexpected OpenAI batch reply:", reply[:1000])
+
+    # Missing or malformed entries are None so classify_ticket can fall back
+    # to the heuristic without caching it as a model answer.
+    return [_normalize_label(replies[i], original_text=t) if i in replies else None for i, t in enumerate(texts)]
+
+
+# OpenAI requests are micro-batched: tickets arriving within OPENAI_BATCH_WINDOW
+# seconds (up to OPENAI_BATCH_SIZE of them) share one chat completion request.
+OPENAI_BATCH_SIZE = 8
+OPENAI_BATCH_WINDOW = 0.025
+
+_pending: list[tuple[str, asyncio.Future]] = []
+_flush_timer: asyncio.Task | None = None
+_batch_tasks: set[asyncio.Task] = set()
+
+
+async def _run_openai_batch(batch: list[tuple[str, asyncio.Future]]):
+    texts = [t for t, _ in batch]
+    try:
+        if len(texts) == 1:
+            labels = [await _classify_one_with_openai(texts[0])]
+        else:
+            labels = await _classify_many_with_openai(texts)
+    except Exception as e:
+        print("OpenAI batch classification failed:", e)
+        labels = ["Task"] * len(texts)
+    for (_, fut), lbl in zip(batch, labels):
+        if not fut.done():
+            fut.set_result(lbl)
+
+
+def _flush_pending():
+    global _pending
+    batch, _pending = _pending, []
+    if batch:
+        task = asyncio.get_running_loop().create_task(_run_openai_batch(batch))
+        # keep a strong reference until the batch completes
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+
+
+async def _flush_after_window():
+    global _flush_timer
+    await asyncio.sleep(OPENAI_BATCH_WINDOW)
+    _flush_timer = None
+    _flush_pending()
+
+
+async def _classify_with_openai(text: str) -> str | None:
+    global _flush_timer
+    if not OPENAI_API_KEY:
+        print("OPENAI_API_KEY not set — skipping OpenAI classification.")
         return "Task"
 
-    return _normalize_label(reply, original_text=text)
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    _pending.append((text, fut))
+    if len(_pending) >= OPENAI_BATCH_SIZE:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        _flush_pending()
+    elif _flush_timer is None:
+        _flush_timer = loop.create_task(_flush_after_window())
+    return await fut
+
+
+# The llama.cpp model is loaded once per process and reused across calls.
+_LLAMA = None
+_LLAMA_LOCK = threading.Lock()
+# Inference runs on a dedicated single-thread executor so a burst of
+# classifications can't starve the default executor used by asyncio.to_thread.
+_LLAMA_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llama")
+# llama.cpp is not safe for concurrent sampling on a single model instance;
+# callers beyond the one in flight wait here instead of piling up in the executor.
+_LLAMA_SEMAPHORE = asyncio.Semaphore(1)
+
+
+def _get_llama(model_path: str):
+    global _LLAMA
+    if _LLAMA is None:
+        with _LLAMA_LOCK:
+            if _LLAMA is None:
+                from llama_cpp import Llama
+                _LLAMA = Llama(model_path=model_path, n_ctx=512, n_threads=os.cpu_count())
+    return _LLAMA
 
 
 async def _classify_with_ggml(text: str) -> str:
-    # Use llama-cpp-python via asyncio.to_thread to avoid blocking the event loop.
+    # Use llama-cpp-python on a dedicated worker thread to avoid blocking the event loop.
     if not GGML_MODEL_PATH:
         return "Task"
     model_file = Path(GGML_MODEL_PATH)
@@ -154,7 +329,7 @@ async def _classify_with_ggml(text: str) -> str:
         return "Task"
 
     try:
-        from llama_cpp import Llama
+        import llama_cpp  # noqa: F401
     except Exception as e:
         print("llama_cpp (llama-cpp-python) not installed or failed to import:", e)
         return "Task"
@@ -166,7 +341,7 @@ async def _classify_with_ggml(text: str) -> str:
     )
 
     def run_sync():
-        llm = Llama(model_path=str(model_file))
+        llm = _get_llama(str(model_file))
 
         def _extract_text(resp):
             if not resp:
@@ -244,7 +419,8 @@ async def _classify_with_ggml(text: str) -> str:
         return None
 
     try:
-        reply = await asyncio.to_thread(run_sync)
+        async with _LLAMA_SEMAPHORE:
+            reply = await asyncio.get_running_loop().run_in_executor(_LLAMA_EXECUTOR, run_sync)
     except Exception as e:
         print("Error while running ggml model:", e)
         return "Task"
@@ -252,10 +428,136 @@ async def _classify_with_ggml(text: str) -> str:
     return _normalize_label(reply, original_text=text)
 
 
+# Classification cache. Ticket wording is highly repetitive, so an exact-match
+# LRU keyed on normalized text (plus an optional embedding similarity tier)
+# skips the model call entirely on repeats.
+CACHE_MAXSIZE = 1024
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_label_cache: OrderedDict[str, str] = OrderedDict()
+_cache_hits = 0
+_cache_misses = 0
+
+_embedder = None
+_semantic_index = None
+_semantic_labels: list[str] = []
+_semantic_lock = threading.Lock()
+_semantic_available = SEMANTIC_CACHE
+
+
+def _cache_key(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _semantic_init() -> bool:
+    """Load the embedding model and faiss index on first use; return False if unavailable."""
+    global _embedder, _semantic_index, _semantic_available
+    if _semantic_index is not None:
+        return True
+    # Any failure here (missing packages, model download, bad model name, ...) turns
+    # the tier off for the process instead of failing every classify call.
+    try:
+        import faiss
+        from sentence_transformers import SentenceTransformer
+
+        embedder = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+        index = faiss.IndexFlatIP(embedder.get_sentence_embedding_dimension())
+    except Exception as e:
+        print("Semantic cache disabled (failed to load sentence-transformers/faiss model):", e)
+        _semantic_available = False
+        return False
+    _embedder, _semantic_index = embedder, index
+    return True
+
+
+def _semantic_lookup(key: str):
+    """Return (label or None, embedding) for the closest cached ticket."""
+    with _semantic_lock:
+        if not _semantic_init():
+            return None, None
+        vec = _embedder.encode([key], normalize_embeddings=True)
+        if _semantic_index.ntotal:
+            scores, ids = _semantic_index.search(vec, 1)
+            if scores[0][0] >= SEMANTIC_CACHE_THRESHOLD:
+                return _semantic_labels[ids[0][0]], vec
+        return None, vec
+
+
+def _semantic_add(vec, label: str):
+    with _semantic_lock:
+        # IndexFlatIP has no cheap eviction, so stop growing once full.
+        if _semantic_index is not None and _semantic_index.ntotal < CACHE_MAXSIZE:
+            _semantic_index.add(vec)
+            _semantic_labels.append(label)
+
+
+def classify_cache_info() -> dict:
+    """Return classification cache metrics (hits, misses and tier sizes)."""
+    return {
+        "hits": _cache_hits,
+        "misses": _cache_misses,
+        "size": len(_label_cache),
+        "maxsize": CACHE_MAXSIZE,
+        "semantic_size": len(_semantic_labels),
+    }
+
+
 async def classify_ticket(text: str) -> str:
     """
     Classify the ticket text into one of the LABELS.
 
+    Tickets the keyword heuristic classifies confidently (at least
+    `HEURISTIC_MIN_SCORE` hits) are returned without any model call. Other
+    results are cached on the normalized ticket text (and, if `SEMANTIC_CACHE`
+    is enabled, on embedding similarity); a cache hit skips the model calls.
+    """
+    global _cache_hits, _cache_misses
+    h, score = _heuristic_label_with_score(text)
+    if h != "Task" and score >= HEURISTIC_MIN_SCORE:
+        return h
+
+    key = _cache_key(text or "")
+    if key in _label_cache:
+        _label_cache.move_to_end(key)
+        _cache_hits += 1
+        return _label_cache[key]
+
+    vec = None
+    if _semantic_available and key:
+        try:
+            lbl, vec = await asyncio.to_thread(_semantic_lookup, key)
+        except Exception as e:
+            print("Semantic cache lookup failed:", e)
+            lbl = None
+        if lbl:
+            _cache_hits += 1
+            return lbl
+
+    _cache_misses += 1
+    lbl = await _classify_uncached(text)
+    if lbl is None:
+        # no usable model answer: use the heuristic, but don't cache it
+        return _heuristic_label_from_text(text)
+
+    # "Task" doubles as the error fallback, so only cache confident labels.
+    if lbl != "Task":
+        _label_cache[key] = lbl
+        if len(_label_cache) > CACHE_MAXSIZE:
+            _label_cache.popitem(last=False)
+        if vec is not None:
+            # _semantic_lock may be held by a lookup encoding (or loading the model)
+            # in a worker thread, so never take it on the event loop.
+            await asyncio.to_thread(_semantic_add, vec, lbl)
+    return lbl
+
+
+async def _classify_uncached(text: str) -> str | None:
+    """
+    Classify the ticket text into one of the LABELS without consulting the cache.
+
+    Returns None when the OpenAI batch reply had no usable entry for the ticket.
+
     Priority order:
     1. If `GGML_MODEL_PATH` points to a local ggml model and `llama-cpp-python` is available, use it (offline).
     2. Else if `OPENAI_API_KEY` is set, call OpenAI chat completions.
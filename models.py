@@ -9,8 +9,8 @@ class TicketLog(Base):
     id = Column(Integer, primary_key=True)
     slack_user = Column(String)
     slack_channel = Column(String)
-    ticket_id = Column(String)
-    jira_issue_key = Column(String)
+    ticket_id = Column(String, index=True, unique=True)
+    jira_issue_key = Column(String, index=True)
     llm_result = Column(Text)
     status = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
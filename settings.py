@@ -0,0 +1,47 @@
+import os
+import base64
+import functools
+from dataclasses import dataclass
+from dotenv import load_dotenv
+import yaml
+
+
+@dataclass(frozen=True)
+class Settings:
+    JIRA_BASE_URL: str
+    JIRA_EMAIL: str | None
+    JIRA_API_TOKEN: str | None
+    JIRA_PROJECT_KEY: str
+    SLACK_BOT_TOKEN: str | None
+    OPENAI_API_KEY: str | None
+    GGML_MODEL_PATH: str | None
+    # Enable the optional embedding-based tier of the classification cache.
+    SEMANTIC_CACHE: bool
+    # Precomputed "Basic <base64>" value for the Jira Authorization header.
+    JIRA_AUTH_HEADER: str
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load `.env` and `config.yml` once and return the process-wide settings."""
+    load_dotenv()
+    with open(os.path.join(os.path.dirname(__file__), "config.yml"), "r") as f:
+        config = yaml.safe_load(f)
+
+    # Read sensitive values from environment variables to avoid committing them to source control.
+    jira_email = os.getenv("JIRA_EMAIL")
+    jira_api_token = os.getenv("JIRA_API_TOKEN")
+    b64_auth = base64.b64encode(f"{jira_email}:{jira_api_token}".encode()).decode()
+
+    return Settings(
+        JIRA_BASE_URL=config["JIRA_BASE_URL"],
+        JIRA_EMAIL=jira_email,
+        JIRA_API_TOKEN=jira_api_token,
+        JIRA_PROJECT_KEY=config.get("JIRA_PROJECT_KEY", "10000"),
+        SLACK_BOT_TOKEN=os.getenv("SLACK_BOT_TOKEN"),
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY"),
+        # path to a ggml .bin model for llama.cpp / llama-cpp-python
+        GGML_MODEL_PATH=os.getenv("GGML_MODEL_PATH"),
+        SEMANTIC_CACHE=os.getenv("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes"),
+        JIRA_AUTH_HEADER=f"Basic {b64_auth}",
+    )
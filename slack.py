@@ -1,72 +1,346 @@
-import os
-from dotenv import load_dotenv
-import yaml
-import json
+import random
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+import logging
+import httpx
+import orjson
 from slack_sdk.web.async_client import AsyncWebClient
 from slack_sdk.errors import SlackApiError
+from settings import get_settings
 
-load_dotenv()
-SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+logger = logging.getLogger(__name__)
+
+# Shared Slack Web API client backed by an explicitly tuned aiohttp session, so
+# keep-alive connections and DNS lookups are reused across messages. Created on
+# first use because aiohttp sessions must be created inside the running loop.
+_slack_session: aiohttp.ClientSession | None = None
+_slack_client: AsyncWebClient | None = None
+
+
+def get_slack_client() -> AsyncWebClient:
+    """Return the shared Slack client, creating it (and its aiohttp session) on first use."""
+    global _slack_session, _slack_client
+    if _slack_client is None:
+        connector = aiohttp.TCPConnector(
+            limit=64,
+            limit_per_host=64,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+            ttl_dns_cache=300,
+        )
+        _slack_session = aiohttp.ClientSession(connector=connector)
+        _slack_client = AsyncWebClient(token=get_settings().SLACK_BOT_TOKEN, session=_slack_session)
+    return _slack_client
+
+
+async def close_slack_client():
+    global _slack_session, _slack_client
+    if _slack_session is not None:
+        await _slack_session.close()
+    _slack_session = None
+    _slack_client = None
+
+# Shared pooled client for posting to Slack `response_url`s (no auth needed).
+_response_client: httpx.AsyncClient | None = None
+
+
+def get_response_client() -> httpx.AsyncClient:
+    """Return the shared response_url client, creating it on first use."""
+    global _response_client
+    if _response_client is None:
+        _response_client = httpx.AsyncClient(http2=True, timeout=15.0)
+    return _response_client
+
+
+async def close_response_client():
+    global _response_client
+    if _response_client is not None:
+        await _response_client.aclose()
+        _response_client = None
+
+
+async def send_response(response_url: str, text: str, blocks=None) -> bool:
+    """Post a deferred slash-command reply to Slack's `response_url`; return True on success."""
+    payload = {"response_type": "in_channel", "text": text}
+    if blocks:
+        payload["blocks"] = blocks
+    try:
+        resp = await get_response_client().post(
+            response_url,
+            content=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+        )
+    except Exception as e:
+        logger.warning("Slack response_url post failed: %s", e)
+        return False
+    if resp.status_code != 200:
+        logger.warning("Slack response_url post failed: status=%s body=%s", resp.status_code, resp.text)
+        return False
+    return True
+
+
+# Retry policy for chat.postMessage: exponential backoff with jitter for 5xx and
+# network errors, Slack's Retry-After on 429, and no retries for errors that
+# can't succeed on a second attempt.
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+RETRY_JITTER = 0.5
+RETRY_MAX_RETRIES = 3
+_UNRECOVERABLE_ERRORS = frozenset({"channel_not_found", "not_in_channel", "invalid_auth"})
+
+
+def _backoff_delay(attempt: int) -> float:
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * (1 + random.random() * RETRY_JITTER)
+
+
+# chat.postMessage allows roughly one message per second per channel; pace sends
+# proactively instead of bursting into 429s and retries.
+CHANNEL_MIN_INTERVAL = 1.0
+_channel_locks: dict[str, asyncio.Lock] = {}
+_channel_last_send: dict[str, float] = {}
+# Caps concurrent chat.postMessage requests across all channel drain tasks.
+MAX_CONCURRENT_DELIVERIES = 32
+_delivery_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DELIVERIES)
+
+
+@asynccontextmanager
+async def _channel_rate_limit(channel: str):
+    lock = _channel_locks.setdefault(channel, asyncio.Lock())
+    async with lock:
+        loop = asyncio.get_running_loop()
+        wait = _channel_last_send.get(channel, float("-inf")) + CHANNEL_MIN_INTERVAL - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            yield
+        finally:
+            _channel_last_send[channel] = loop.time()
+
+
+async def _post_message(**kwargs):
+    """Call chat_postMessage, retrying transient failures with `asyncio.sleep` between attempts."""
+    for attempt in range(RETRY_MAX_RETRIES + 1):
+        last_attempt = attempt == RETRY_MAX_RETRIES
+        try:
+            async with _channel_rate_limit(kwargs.get("channel")):
+                # held only for the request itself, never across pacing or backoff sleeps
+                async with _delivery_semaphore:
+                    return await get_slack_client().chat_postMessage(**kwargs)
+        except SlackApiError as e:
+            if last_attempt or e.response.data.get("error") in _UNRECOVERABLE_ERRORS:
+                raise
+            if e.response.status_code == 429:
+                delay = float(e.response.headers.get("Retry-After", RETRY_BASE_DELAY))
+            elif e.response.status_code >= 500:
+                delay = _backoff_delay(attempt)
+            else:
+                raise
+            logger.warning("chat_postMessage failed (%s); retrying in %.2fs", e.response.data.get("error"), delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning("chat_postMessage failed (%s); retrying in %.2fs", e, delay)
+        await asyncio.sleep(delay)
+
+
+# Outbound messages are queued per channel and drained by one task per channel.
+# Messages arriving within COALESCE_WINDOW seconds are merged into a single
+# chat.postMessage; interactive (actions) messages are always sent on their own.
+COALESCE_WINDOW = 0.05
+MAX_BLOCKS_PER_MESSAGE = 50
+_queues: dict[str, asyncio.Queue] = {}
+_drain_tasks: dict[str, asyncio.Task] = {}
+
+
+def _has_actions(blocks) -> bool:
+    return any(isinstance(b, dict) and b.get("type") == "actions" for b in blocks or ())
+
+
+def _coalesce(batch: list[tuple]) -> list[tuple]:
+    """Merge consecutive compatible (text, blocks, fallback_user, future) messages, preserving order.
+
+    Each merged entry carries the list of futures it delivers.
+    """
+    merged = []
+    for text, blocks, fallback_user, fut in batch:
+        if merged and not _has_actions(blocks):
+            prev_text, prev_blocks, prev_user, prev_futs = merged[-1]
+            # only merge like with like: text-only with text-only, blocks with blocks
+            if (
+                prev_user == fallback_user
+                and not _has_actions(prev_blocks)
+                and bool(prev_blocks) == bool(blocks)
+                and len(prev_blocks or ()) + len(blocks or ()) <= MAX_BLOCKS_PER_MESSAGE
+            ):
+                prev_futs.append(fut)
+                merged[-1] = (f"{prev_text}\n{text}", [*prev_blocks, *blocks] if blocks else None, prev_user, prev_futs)
+                continue
+        merged.append((text, blocks, fallback_user, [fut]))
+    return merged
+
+
+def _resolve(futs: list[asyncio.Future]):
+    for fut in futs:
+        # a caller that stopped waiting may have cancelled its future already
+        if not fut.done():
+            fut.set_result(None)
+
+
+async def _drain_channel(channel: str):
+    queue = _queues[channel]
+    try:
+        while not queue.empty():
+            first = queue.get_nowait()
+            await asyncio.sleep(COALESCE_WINDOW)
+            batch = [first]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            pending = _coalesce(batch)
+            try:
+                while pending:
+                    text, blocks, fallback_user, futs = pending[0]
+                    await _deliver_message(channel, text, blocks, fallback_user)
+                    _resolve(futs)
+                    pending.pop(0)
+            except BaseException:
+                # messages taken off the queue but not delivered are dropped; let their waiters go
+                for _, _, _, futs in pending:
+                    for fut in futs:
+                        fut.cancel()
+                raise
+    finally:
+        # Runs on normal exit, cancellation and errors alike, so a dead task never
+        # blocks the channel: the next send_message starts a fresh drain task and
+        # picks up anything still queued.
+        if _drain_tasks.get(channel) is asyncio.current_task():
+            del _drain_tasks[channel]
+        if queue.empty() and _queues.get(channel) is queue:
+            del _queues[channel]
+
+
+def send_message_nowait(channel: str, text: str, blocks=None, fallback_user: str = None) -> asyncio.Future:
+    """Queue a message for `channel` without awaiting; the channel's drain task posts it.
+
+    Returns a future that resolves once the message has been handed to Slack.
+    """
+    fut = asyncio.get_running_loop().create_future()
+    queue = _queues.get(channel)
+    if queue is None:
+        queue = _queues[channel] = asyncio.Queue()
+    queue.put_nowait((text, blocks, fallback_user, fut))
+    task = _drain_tasks.get(channel)
+    if task is None or task.done():
+        # _drain_tasks holds the strong reference that keeps the task alive
+        _drain_tasks[channel] = asyncio.create_task(_drain_channel(channel))
+    return fut
 
-slack_client = AsyncWebClient(token=SLACK_BOT_TOKEN)
 
 async def send_message(channel: str, text: str, blocks=None, fallback_user: str = None):
+    """Queue a message for `channel` and wait until it has been posted (possibly merged with others)."""
+    await send_message_nowait(channel, text, blocks=blocks, fallback_user=fallback_user)
+
+
+async def flush_slack_queues(timeout: float = 10.0):
+    """Wait for every queued message to be delivered; cancel drains still running after `timeout`."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # drain tasks can be (re)started while we wait, so loop until none are left
+    while _drain_tasks:
+        tasks = list(_drain_tasks.values())
+        _, still_running = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+        if still_running:
+            logger.warning("Cancelling %d Slack drain task(s) still running at shutdown", len(still_running))
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+            # release anyone still awaiting messages that will now never be sent
+            for queue in _queues.values():
+                while not queue.empty():
+                    queue.get_nowait()[3].cancel()
+            _queues.clear()
+            break
+
+
+# user id -> (DM channel id, expiry) so repeat DMs skip conversations_open.
+DM_CACHE_TTL = 3600.0
+_dm_cache: dict[str, tuple[str, float]] = {}
+_dm_locks: dict[str, asyncio.Lock] = {}
+
+
+async def _get_dm_channel(user_id: str) -> str | None:
+    """Return the DM channel id for `user_id`, opening the conversation only on a cache miss."""
+    loop = asyncio.get_running_loop()
+    cached = _dm_cache.get(user_id)
+    if cached and cached[1] > loop.time():
+        return cached[0]
+    # one in-flight conversations_open per user; concurrent callers reuse its result
+    lock = _dm_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        cached = _dm_cache.get(user_id)
+        if cached and cached[1] > loop.time():
+            return cached[0]
+        conv = await get_slack_client().conversations_open(users=user_id)
+        conv_channel = conv.get("channel", {}).get("id")
+        if conv_channel:
+            _dm_cache[user_id] = (conv_channel, loop.time() + DM_CACHE_TTL)
+        return conv_channel
+
+
+async def _deliver_message(channel: str, text: str, blocks=None, fallback_user: str = None):
     try:
-        # Log the blocks payload for debugging
-        if blocks:
-            print("Slack Blocks Payload:", json.dumps(blocks, indent=2))
-            # Print types of value fields to help debug invalid_blocks
+        # Log the blocks payload for debugging (skipped entirely unless debug logging is on)
+        if blocks and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Slack Blocks Payload: %s", orjson.dumps(blocks, option=orjson.OPT_INDENT_2).decode())
+            # Log types of value fields to help debug invalid_blocks (one record for all elements)
+            lines = []
             for i, block in enumerate(blocks):
-                if isinstance(block, dict) and block.get("elements"):
-                    for j, el in enumerate(block.get("elements", [])):
-                        val = el.get("value")
-                        print(f"blocks[{i}].elements[{j}].value=", repr(val), "type=", type(val))
-
-        # If channel looks like a DM (starts with 'D') prefer opening a conversation by user id
-        # when a fallback_user is provided. This avoids channel_not_found when Slack reports a DM id
-        # that the bot can't post to directly.
-        if channel and isinstance(channel, str) and channel.startswith("D") and fallback_user:
-            try:
-                conv = await slack_client.conversations_open(users=fallback_user)
-                conv_channel = conv.get("channel", {}).get("id")
-                if conv_channel:
-                    channel = conv_channel
-            except Exception as e:
-                print("Failed to open IM for DM channel fallback:", e)
-
-        response = await slack_client.chat_postMessage(
+                els = block.get("elements") if type(block) is dict else None
+                if not els:
+                    continue
+                for j, el in enumerate(els):
+                    v = el.get("value")
+                    lines.append(f"blocks[{i}].elements[{j}].value={v!r} type={type(v).__name__}")
+            if lines:
+                logger.debug("\n".join(lines))
+
+        response = await _post_message(
             channel=channel,
             text=text,
             blocks=blocks
         )
         if not response["ok"]:
-            print(f"Slack API returned ok: False")
-            print("Response:", json.dumps(response.data, indent=2))
+            logger.error("Slack API returned ok: False. Response: %s", response.data)
             if response.data.get("error") == "channel_not_found":
-                print("Error: The specified channel was not found. Ensure the bot is invited to the channel.")
+                logger.error("The specified channel was not found. Ensure the bot is invited to the channel.")
 
     except SlackApiError as e:
-        print("Slack send_message error (SlackApiError):", e)
-        print("Error details:", e.response.data)
+        logger.error("Slack send_message error (SlackApiError): %s. Error details: %s", e, e.response.data)
         err = e.response.data.get("error")
         if err == "not_in_channel":
-            print("Hint: Invite your bot to the channel with /invite @your-bot-name")
+            logger.error("Hint: Invite your bot to the channel with /invite @your-bot-name")
         elif err == "channel_not_found":
-            print("Error: The specified channel was not found. Ensure the bot is invited to the channel.")
+            logger.error("The specified channel was not found. Ensure the bot is invited to the channel.")
             # Try to DM the user as a fallback if we have their user id
             if fallback_user:
                 try:
-                    print(f"Attempting to open IM with user {fallback_user} as fallback...")
-                    conv = await slack_client.conversations_open(users=fallback_user)
-                    conv_channel = conv.get("channel", {}).get("id")
+                    logger.info("Attempting to open IM with user %s as fallback...", fallback_user)
+                    conv_channel = await _get_dm_channel(fallback_user)
                     if conv_channel:
-                        print(f"Opened IM channel {conv_channel}, sending message there")
-                        await slack_client.chat_postMessage(channel=conv_channel, text=text, blocks=blocks)
-                except Exception as ex:
-                    print("Failed to send fallback DM:", ex)
+                        logger.info("Opened IM channel %s, sending message there", conv_channel)
+                        await _post_message(channel=conv_channel, text=text, blocks=blocks)
+                except Exception:
+                    logger.exception("Failed to send fallback DM")
+
+    except Exception:
+        logger.exception("Slack send_message error (Generic Exception)")
+
+# Invariant parts of the approval block, shared by every build_approval_block() call.
+# Slack only serializes these, so they are never mutated.
+_APPROVE_BUTTON_TEXT = {"type": "plain_text", "text": "Approve"}
+_REJECT_BUTTON_TEXT = {"type": "plain_text", "text": "Reject"}
 
-    except Exception as e:
-        print(f"Slack send_message error (Generic Exception): {e}")
 
 def build_approval_block(jira_key: str) -> list:
     safe_key = str(jira_key) if jira_key else "UNKNOWN"
@@ -84,7 +358,7 @@ def build_approval_block(jira_key: str) -> list:
             "elements": [
                 {
                     "type": "button",
-                    "text": {"type": "plain_text", "text": "Approve"},
+                    "text": _APPROVE_BUTTON_TEXT,
                     "style": "primary",
                     # value should carry the jira key so the actions handler can find the ticket
                     "value": safe_key,
@@ -92,7 +366,7 @@ def build_approval_block(jira_key: str) -> list:
                 },
                 {
                     "type": "button",
-                    "text": {"type": "plain_text", "text": "Reject"},
+                    "text": _REJECT_BUTTON_TEXT,
                     "style": "danger",
                     "value": safe_key,
                     "action_id": "reject_ticket"